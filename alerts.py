@@ -0,0 +1,156 @@
+"""Alert consolidation: turn every qualifying vitals row into a few alert events.
+
+A gateway's NEWS band (the `get_warning_message` bands) and its
+Tachycardia/Bradycardia flag are combined into one alert level:
+
+    0 none, 1 low, 2 medium, 3 high
+
+Rows at or above `min_level` open an episode for the gateway. Within an
+episode only these events are emitted:
+
+    onset       first qualifying row of the episode
+    escalation  the level rises above the episode's current level
+    change      a qualifying row's HR condition differs from the episode's
+                current one (e.g. Tachycardia, then Bradycardia) and was not
+                alerted in the last `dedup_window` seconds
+    reminder    the level is unchanged and `dedup_window` seconds passed since the last event
+    resolved    the level stayed below `min_level` for `clear_after` seconds
+
+Drops in level are hysteretic: the episode only steps down (silently) or
+resolves after the lower level has held for `clear_after` seconds, so a
+value flapping around a band edge does not re-alert. Other qualifying
+rows are repeats: they are counted in the `Suppressed` column of the next
+event.
+"""
+import numpy as np
+import pandas as pd
+import profiling
+from scoring import WARNING_MESSAGES
+
+BANDS = ["none", "low", "medium", "high"]
+LEVELS = {band: level for level, band in enumerate(BANDS)}
+
+
+class AlertConsolidator:
+    """Per-gateway alert state; feed it frames in time order with `process`."""
+
+    def __init__(self, min_level=2, dedup_window=900, clear_after=300, condition_level=2, emit_resolved=True):
+        self.min_level = min_level
+        self.dedup_window = dedup_window
+        self.clear_after = clear_after
+        self.condition_level = condition_level
+        self.emit_resolved = emit_resolved
+        self.episodes = {}  # GatewayName -> episode dict
+        self.rows_in = 0
+        self.events_out = 0
+
+    def levels(self, frame):
+        """Alert level of every row from its NEWS band and HR condition."""
+        level = np.zeros(len(frame), dtype=np.int8)
+        if "NEWS_Score" in frame.columns:
+            news = frame["NEWS_Score"].to_numpy()
+            level = np.select([news > 6, news > 4, news >= 1], [3, 2, 1], 0).astype(np.int8)
+        if "Condition" in frame.columns:
+            flagged = (frame["Condition"] != "Normal").to_numpy()
+            level = np.where(flagged, np.maximum(level, self.condition_level), level)
+        return level
+
+    def process(self, frame):
+        """Return the alert events for `frame` as a DataFrame, updating the state."""
+        with profiling.span("alerts.process"):
+            events = self._process(frame)
+        profiling.incr("alerts_rows_in", len(frame))
+        profiling.incr("alerts_events_out", len(events))
+        return events
+
+    def _process(self, frame):
+        # Unparseable timestamps still open and escalate episodes but never
+        # count towards a dedup window or a resolve timer
+        timestamps = pd.to_datetime(frame["Timestamp"], errors="coerce").to_numpy().astype("datetime64[ns]")
+        order = np.argsort(timestamps, kind="stable")
+        seconds = np.where(np.isnat(timestamps), np.nan, timestamps.astype(np.int64) / 1e9)[order]
+        levels = self.levels(frame)[order]
+        gateways = frame["GatewayName"].to_numpy()[order]
+        if "Condition" in frame.columns:
+            conditions = frame["Condition"].where(frame["Condition"] != "Normal").to_numpy()[order]
+        else:
+            conditions = np.full(len(frame), np.nan, dtype=object)
+        positions = order
+        self.rows_in += len(frame)
+
+        events = []  # (row position, event, level, suppressed)
+        for position, gateway, now, level, condition in zip(positions, gateways, seconds, levels, conditions):
+            condition = None if pd.isna(condition) else condition
+            episode = self.episodes.get(gateway)
+            if episode is None:
+                if level >= self.min_level:
+                    self.episodes[gateway] = {"level": level, "condition": condition, "last_sent": now,
+                                              "condition_sent": {condition: now} if condition else {},
+                                              "below_since": None, "clear_since": None, "suppressed": 0}
+                    events.append((position, "onset", level, 0))
+                continue
+
+            if level >= self.min_level:
+                episode["clear_since"] = None
+            elif episode["clear_since"] is None:
+                episode["clear_since"] = now
+
+            # An artifact spike flags Tachycardia then Bradycardia; a condition
+            # flip only alerts if that condition was quiet for `dedup_window`
+            changed = condition is not None and condition != episode["condition"] and level >= self.min_level
+            if changed:
+                episode["condition"] = condition
+                last_sent = episode["condition_sent"].get(condition)
+                changed = last_sent is None or now - last_sent >= self.dedup_window
+
+            if level > episode["level"]:
+                episode["level"] = level
+                episode["below_since"] = None
+                self._sent(episode, "escalation", position, level, now, events)
+            elif changed:
+                self._sent(episode, "change", position, level, now, events)
+            elif level < episode["level"]:
+                if episode["clear_since"] is not None and now - episode["clear_since"] >= self.clear_after:
+                    del self.episodes[gateway]
+                    if self.emit_resolved:
+                        events.append((position, "resolved", level, episode["suppressed"]))
+                    continue
+                if episode["below_since"] is None:
+                    episode["below_since"] = now
+                if level >= self.min_level:
+                    if now - episode["below_since"] >= self.clear_after:
+                        episode["level"] = level
+                        episode["below_since"] = None
+                    episode["suppressed"] += 1
+            else:
+                episode["below_since"] = None
+                if now - episode["last_sent"] >= self.dedup_window:
+                    self._sent(episode, "reminder", position, level, now, events)
+                else:
+                    episode["suppressed"] += 1
+
+        self.events_out += len(events)
+        rows = [position for position, _, _, _ in events]
+        result = frame.iloc[rows].copy()
+        result["Event"] = [event for _, event, _, _ in events]
+        result["Alert_Level"] = [BANDS[level] for _, _, level, _ in events]
+        result["Alert_Message"] = [WARNING_MESSAGES[BANDS[level]] for _, _, level, _ in events]
+        result["Suppressed"] = [suppressed for _, _, _, suppressed in events]
+        return result
+
+    @staticmethod
+    def _sent(episode, event, position, level, now, events):
+        events.append((position, event, level, episode["suppressed"]))
+        episode["suppressed"] = 0
+        episode["last_sent"] = now
+        if episode["condition"]:
+            episode["condition_sent"][episode["condition"]] = now
+
+    def reduction(self):
+        """Rows seen per event emitted so far."""
+        return self.rows_in / self.events_out if self.events_out else float("inf")
+
+
+def consolidate(frame, **options):
+    """One-shot consolidation of a whole frame; see `AlertConsolidator` for options."""
+    return AlertConsolidator(**options).process(frame)
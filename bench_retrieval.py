@@ -0,0 +1,118 @@
+"""Retrieval quality and latency of the encoder variants and PQ index against IndexFlatL2.
+
+    python bench_retrieval.py guidelines/*.pdf --queries 200 -k 3
+    python bench_retrieval.py --embeddings corpus.npy --queries 1000 -k 10
+
+Queries are the opening words of randomly chosen chunks, so every query has
+a known source chunk (self-recall@k). Overlap@k is the share of the float32
+IndexFlatL2 top-k that a variant also returns.
+
+With --embeddings, only the flat vs PQ index comparison runs, on a saved
+(n, d) float32 array; the queries are randomly chosen rows plus Gaussian
+noise of --noise standard deviation.
+"""
+import time
+import argparse
+import numpy as np
+from encoder import VARIANTS, QueryEncoder, load_model
+from retrieval import PQ_MIN_VECTORS, chunk_pages, load_pdfs, make_vector_index
+
+
+def normalize(vectors):
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def search(index, queries, k):
+    return index.search(queries, k)[1]
+
+
+def self_recall(ids, truth):
+    return float(np.mean([t in row for row, t in zip(ids, truth)]))
+
+
+def overlap(ids, reference):
+    return float(np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(ids, reference)]))
+
+
+def index_bytes(index):
+    import faiss
+
+    return faiss.serialize_index(index).nbytes
+
+
+def compare_indexes(corpus, queries, truth, k):
+    import faiss
+
+    reference = None
+    print(f"\n{'index':>8} {'bytes':>12} {'ms/query':>9} {'self-recall':>12} {'overlap':>8}")
+    for label, compress in (("flat", False), ("pq", True)):
+        index = make_vector_index(corpus, compress=compress)
+        if compress and not isinstance(index, faiss.IndexPQ):
+            print(f"{label:>8} skipped: corpus below PQ_MIN_VECTORS ({PQ_MIN_VECTORS})")
+            continue
+        start = time.perf_counter()
+        ids = search(index, queries, k)
+        elapsed = (time.perf_counter() - start) / len(queries) * 1000
+        if reference is None:
+            reference = ids
+        print(f"{label:>8} {index_bytes(index):12d} {elapsed:9.3f} {self_recall(ids, truth):12.3f} {overlap(ids, reference):8.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdfs", nargs="*")
+    parser.add_argument("--embeddings", help="Compare indexes on this .npy array instead of encoding PDFs")
+    parser.add_argument("--noise", type=float, default=0.05)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--query-words", type=int, default=12)
+    parser.add_argument("-k", type=int, default=3)
+    parser.add_argument("--variants", nargs="+", default=list(VARIANTS), choices=VARIANTS)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    if args.embeddings:
+        corpus = normalize(np.load(args.embeddings).astype(np.float32))
+        truth = rng.choice(len(corpus), size=min(args.queries, len(corpus)), replace=False)
+        queries = corpus[truth] + rng.normal(scale=args.noise, size=(len(truth), corpus.shape[1]))
+        print(f"{corpus.shape[0]} vectors of dimension {corpus.shape[1]}, {len(truth)} queries, k={args.k}")
+        compare_indexes(corpus, normalize(queries.astype(np.float32)), truth, args.k)
+        return
+    if not args.pdfs:
+        parser.error("give PDFs to encode or --embeddings")
+
+    chunks = chunk_pages(load_pdfs(args.pdfs))
+    texts = [chunk["text"] for chunk in chunks]
+    truth = rng.choice(len(texts), size=min(args.queries, len(texts)), replace=False)
+    queries = [" ".join(texts[i].split()[:args.query_words]) for i in truth]
+    print(f"{len(texts)} chunks, {len(queries)} queries, k={args.k}\n")
+
+    reference = None
+    print(f"{'encoder':>8} {'ms/query':>9} {'cached ms':>10} {'self-recall':>12} {'overlap':>8}")
+    for variant in args.variants:
+        try:
+            encoder = QueryEncoder(load_model(variant=variant))
+        except Exception as e:
+            print(f"{variant:>8} unavailable: {e}")
+            continue
+        corpus = normalize(encoder.encode(texts))
+        index = make_vector_index(corpus)
+
+        start = time.perf_counter()
+        encoded = normalize(np.concatenate([encoder.encode([q]) for q in queries]))
+        uncached = (time.perf_counter() - start) / len(queries) * 1000
+        start = time.perf_counter()
+        for q in queries:
+            encoder.encode([q])
+        cached = (time.perf_counter() - start) / len(queries) * 1000
+
+        ids = search(index, encoded, args.k)
+        if reference is None:
+            reference, reference_corpus, reference_queries = ids, corpus, encoded
+        print(f"{variant:>8} {uncached:9.2f} {cached:10.3f} {self_recall(ids, truth):12.3f} {overlap(ids, reference):8.3f}")
+
+    if reference is not None:
+        compare_indexes(reference_corpus, reference_queries, truth, args.k)
+
+
+if __name__ == "__main__":
+    main()
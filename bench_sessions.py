@@ -0,0 +1,79 @@
+"""Memory use of N concurrent dashboard sessions, per-session copies vs the shared data service.
+
+    python bench_sessions.py --sessions 50 --rows 200000
+    python bench_sessions.py --csv icu_updated_v2.csv
+
+Each simulated session runs in its own thread, like Streamlit sessions do,
+and keeps its data alive until all sessions have loaded.
+"""
+import os
+import argparse
+import tempfile
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import data_service
+
+COLUMNS = ["GatewayName", "HR", "NIBP_Systolic", "NIBP_Diastolic", "SpO2", "RR", "Timestamp", "GCS", "Age"]
+
+
+def write_sample_csv(path, rows, gateways=40, seed=0):
+    rng = np.random.default_rng(seed)
+    pd.DataFrame({
+        "GatewayName": rng.choice([f"Test-hsp-2024-01-{i:03d}" for i in range(gateways)], rows),
+        "HR": rng.normal(85, 20, rows).round(),
+        "NIBP_Systolic": rng.normal(120, 20, rows).round(),
+        "NIBP_Diastolic": rng.normal(75, 10, rows).round(),
+        "SpO2": rng.normal(96, 2, rows).clip(70, 100).round(),
+        "RR": rng.normal(16, 4, rows).round(),
+        "Timestamp": pd.Timestamp("2024-01-01") + pd.to_timedelta(np.arange(rows) * 2, unit="s"),
+        "GCS": rng.integers(3, 16, rows),
+        "Age": rng.integers(18, 95, rows),
+    }).to_csv(path, index=False)
+
+
+def per_session_copy(path):
+    # What every session did before: its own read, scores and conditions
+    return data_service.read_vitals(path, usecols=COLUMNS, conditions=True)
+
+
+def shared_service(path):
+    return data_service.load_vitals(path, usecols=COLUMNS, conditions=True)
+
+
+def measure(loader, path, sessions):
+    tracemalloc.start()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        held = list(pool.map(lambda _: loader(path), range(sessions)))
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del held
+    return current, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--csv", help="Vitals CSV to load (default: generate a sample file)")
+    parser.add_argument("--rows", type=int, default=200_000, help="Rows in the generated sample")
+    parser.add_argument("--sessions", type=int, default=50)
+    args = parser.parse_args()
+
+    path = args.csv
+    if path is None:
+        handle, path = tempfile.mkstemp(suffix=".csv")
+        os.close(handle)
+        write_sample_csv(path, args.rows)
+    try:
+        rows = len(data_service.read_vitals(path, usecols=COLUMNS, conditions=True))
+        print(f"{args.sessions} sessions, {rows} rows")
+        for label, loader in (("per-session copies", per_session_copy), ("shared service", shared_service)):
+            current, peak = measure(loader, path, args.sessions)
+            print(f"{label:>20}: held {current / 2**20:8.1f} MiB, peak {peak / 2**20:8.1f} MiB")
+    finally:
+        if args.csv is None:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,72 @@
-import faiss
-import pandas as pd
-import PyPDF2
-import ollama
+import time
+_script_start = time.perf_counter()
+import os
 import streamlit as st
-from sentence_transformers import SentenceTransformer
-import numpy as np
+import profiling
+import data_service
+from encoder import QueryEncoder, load_model
+from retrieval import HybridRetriever, chunk_pages, format_context, load_pdfs
+from context import build_patient_digest
 
-# Load Sentence Transformer model
-model = SentenceTransformer('all-MiniLM-L6-v2')
+# faiss, PyPDF2, ollama and sentence_transformers are imported on first use
+# so the chat page renders before the heavy ML stack is loaded.
 
-# Load and process PDF knowledge base
-def load_pdfs(pdf_paths):
-    texts = []
-    for pdf_path in pdf_paths:
-        with open(pdf_path, "rb") as file:
-            reader = PyPDF2.PdfReader(file)
-            for page in reader.pages:
-                texts.append(page.extract_text())
-    return texts
+# Embedding variant (float32 / int8 / onnx) and PQ-compressed index, see encoder.py
+ENCODER_VARIANT = os.getenv("CAREWORX_ENCODER", "float32")
+COMPRESS_INDEX = os.getenv("CAREWORX_PQ", "").strip().lower() in ("1", "true", "yes", "on")
+# Token budget for the patient vitals digest in each prompt
+PATIENT_CONTEXT_TOKENS = 400
 
-# Load and process CSV patient database
+# Load Sentence Transformer model once per process, shared by all sessions
+@st.cache_resource(show_spinner="Loading embedding model...")
+def get_model(name='all-MiniLM-L6-v2', variant=ENCODER_VARIANT):
+    with profiling.span("bot.load_model"):
+        return load_model(name, variant)
+
+# Query encoder with an LRU cache of question embeddings, shared by all sessions
+@st.cache_resource(show_spinner=False)
+def get_encoder():
+    return QueryEncoder(get_model())
+
+# Load and process CSV patient database (one shared copy per file)
 def load_csv(csv_path):
-    df = pd.read_csv(csv_path)
+    df = data_service.load_vitals(csv_path, score=False).frame
     return df
 
-# Create FAISS index
-def create_faiss_index(texts):
-    embeddings = model.encode(texts)
-    dimension = embeddings.shape[1]
-    index = faiss.IndexFlatL2(dimension)
-    index.add(np.array(embeddings))
-    return index, texts
+# Create the hybrid BM25 + FAISS index over page chunks
+@profiling.timed("bot.create_index")
+def create_index(pages):
+    return HybridRetriever(chunk_pages(pages), get_encoder().encode, compress=COMPRESS_INDEX)
+
+# Index each set of PDFs once per process and share it between sessions.
+# `pdf_files` is a tuple of (path, mtime) pairs so edited PDFs are re-indexed.
+@st.cache_resource(show_spinner="Indexing PDFs...", max_entries=4)
+def get_knowledge_base(pdf_files):
+    return create_index(load_pdfs([path for path, _ in pdf_files]))
 
-# Retrieve relevant text from FAISS
-def retrieve_faiss(query, index, texts, top_k=3):
-    query_embedding = model.encode([query])
-    distances, indices = index.search(np.array(query_embedding), top_k)
-    results = [texts[idx] for idx in indices[0]]
-    return results
+def file_key(paths):
+    return tuple((path, os.path.getmtime(path)) for path in paths)
 
-# Retrieve patient vitals from CSV
-def get_patient_vitals(query, patient_data):
+# Retrieve relevant chunks (BM25 + vector, reranked and deduplicated)
+@profiling.timed("bot.retrieve")
+def retrieve(query, retriever, top_k=3, documents=None, section=None):
+    return retriever.search(query, top_k=top_k, documents=documents, section=section)
+
+# Retrieve patient vitals from CSV as a fixed-size digest of the matching rows
+@profiling.timed("bot.get_patient_vitals")
+def get_patient_vitals(query, patient_data, budget_tokens=PATIENT_CONTEXT_TOKENS):
     if patient_data is not None:
         matching_rows = patient_data[patient_data.apply(lambda row: query.lower() in row.to_string().lower(), axis=1)]
-        return matching_rows.to_dict(orient='records') if not matching_rows.empty else []
-    return []
+        profiling.incr("bot_patient_rows_matched", len(matching_rows))
+        with profiling.span("bot.patient_digest"):
+            return build_patient_digest(matching_rows, budget_tokens=budget_tokens)
+    return ""
 
 # Generate response ussing deepsek
 def generate_response(context, query, patient_info):
-    patient_context = f"\nPatient Vitals: {patient_info}" if patient_info else ""
+    import ollama
+
+    patient_context = f"\nPatient Vitals:\n{patient_info}" if patient_info else ""
     prompt = (
         "You are an AI-powered ICU monitoring assistant specializing in early warning system (EWS) detection, "
         "including NEWS (National Early Warning Score) assessment. Your task is to analyze real-time ICU patient vitals, "
@@ -56,37 +74,51 @@ def generate_response(context, query, patient_info):
         "to doctors and medical staff. \n\n"
         f"Context: {context}{patient_context}\nUser Query: {query}\nResponse:"
     )
-    response = ollama.generate(model='deepseek-r1', prompt=prompt)
+    profiling.incr("bot_prompt_chars", len(prompt))
+    with profiling.span("bot.llm_generate"):
+        response = ollama.generate(model='deepseek-r1', prompt=prompt)
     return response['response']
 
 # Streamlit UI
 def main():
     st.title("Medical Nurse Assistant Chatbot")
+    if profiling.ENABLED:
+        profiling.record("bot.time_to_first_paint", time.perf_counter() - _script_start)
+    profiling.render_panel()
     st.sidebar.header("Upload Data")
     pdf_files = st.sidebar.file_uploader("Upload PDF Knowledge Base", accept_multiple_files=True, type=["pdf"])
     csv_file = st.sidebar.file_uploader("Upload Patient Vitals Database", type=["csv"])
     
     if st.sidebar.button("Process Data"):
         if pdf_files:
-            pdf_texts = load_pdfs([file.name for file in pdf_files])
-            faiss_index, text_corpus = create_faiss_index(pdf_texts)
-            st.session_state["faiss_index"] = faiss_index
-            st.session_state["text_corpus"] = text_corpus
+            knowledge_base = file_key([file.name for file in pdf_files])
+            get_knowledge_base(knowledge_base)
+            st.session_state["knowledge_base"] = knowledge_base
             st.success("PDF Knowledge Base Processed Successfully!")
         if csv_file:
-            patient_data = load_csv(csv_file.name)
-            st.session_state["patient_data"] = patient_data
+            load_csv(csv_file.name)
+            st.session_state["patient_data_path"] = csv_file.name
             st.success("CSV Patient Vitals Database Processed Successfully!")
     
+    document_filter, section_filter, top_k = None, None, 3
+    if "knowledge_base" in st.session_state:
+        retriever = get_knowledge_base(st.session_state["knowledge_base"])
+        st.sidebar.header("Search Filters")
+        document_filter = st.sidebar.multiselect("Documents", retriever.documents)
+        section_filter = st.sidebar.text_input("Section contains")
+        top_k = st.sidebar.slider("Passages per answer", 1, 8, 3)
+
     if "chat_history" not in st.session_state:
         st.session_state["chat_history"] = []
     
     query = st.text_input("Ask a medical question:")
     if st.button("Get Response") and query:
-        if "faiss_index" in st.session_state and "text_corpus" in st.session_state:
-            retrieved_texts = retrieve_faiss(query, st.session_state["faiss_index"], st.session_state["text_corpus"])
-            context = "\n".join(retrieved_texts)
-            patient_info = get_patient_vitals(query, st.session_state.get("patient_data"))
+        if "knowledge_base" in st.session_state:
+            retrieved = retrieve(query, retriever, top_k=top_k, documents=document_filter, section=section_filter)
+            context = format_context(retrieved)
+            patient_path = st.session_state.get("patient_data_path")
+            patient_data = load_csv(patient_path) if patient_path else None
+            patient_info = get_patient_vitals(query, patient_data)
             response = generate_response(context, query, patient_info)
             st.session_state["chat_history"].append({"query": query, "response": response})
             
@@ -0,0 +1,117 @@
+"""Fixed-size patient digests for LLM prompts.
+
+Instead of dumping every matching vitals row into the prompt, each patient
+is summarized as latest values, min/max/trend per vital, NEWS band counts
+and the most recent alert events. Sections are added in priority order
+until the token budget is used up, so the prompt stays the same size no
+matter how long the patient's history is.
+"""
+import numpy as np
+import pandas as pd
+from scoring import news_scores, news_band
+from alerts import AlertConsolidator
+
+VITALS = ["HR", "SpO2", "RR", "NIBP_Systolic", "NIBP_Diastolic", "Temperature", "GCS"]
+NEWS_INPUTS = {"HR", "NIBP_Systolic", "SpO2", "RR"}
+PATIENT_COLUMN = "GatewayName"
+
+
+def estimate_tokens(text):
+    # ~4 characters per token for English text and numbers
+    return (len(text) + 3) // 4
+
+
+def _fmt(value):
+    if pd.isna(value):
+        return "n/a"
+    return f"{value:.0f}" if float(value).is_integer() else f"{value:.1f}"
+
+
+def _trend(series):
+    """Rising/falling/stable from the mean of the first vs last third of readings."""
+    values = series.dropna().to_numpy()
+    if len(values) < 3:
+        return "stable"
+    third = max(len(values) // 3, 1)
+    delta = values[-third:].mean() - values[:third].mean()
+    spread = np.abs(values).mean() or 1.0
+    if abs(delta) < 0.05 * spread:
+        return "stable"
+    return f"{'rising' if delta > 0 else 'falling'} ({delta:+.0f})"
+
+
+def _sections(patient, rows, max_alerts):
+    """Digest lines for one patient, most important first."""
+    if "Timestamp" in rows.columns:
+        times = pd.to_datetime(rows["Timestamp"], errors="coerce")
+        rows = rows.assign(_time=times).sort_values("_time", kind="stable")
+        span = f", {_fmt_time(times.min())} to {_fmt_time(times.max())}"
+    else:
+        span = ""
+    vitals = [column for column in VITALS if column in rows.columns]
+    latest = rows.iloc[-1]
+
+    yield f"Patient {patient}: {len(rows)} readings{span}"
+    if vitals:
+        yield "  Latest: " + ", ".join(f"{column} {_fmt(latest[column])}" for column in vitals)
+
+    news = rows["NEWS_Score"] if "NEWS_Score" in rows.columns else (
+        news_scores(rows) if NEWS_INPUTS.issubset(rows.columns) else None)
+    if news is not None:
+        bands = news.map(news_band).value_counts()
+        counts = ", ".join(f"{band} {bands[band]}" for band in ("high", "medium", "low", "none") if band in bands)
+        yield f"  NEWS: latest {_fmt(news.iloc[-1])} ({news_band(news.iloc[-1])}), max {_fmt(news.max())}; readings by band: {counts}"
+    for column in ("APACHE_II_Score", "SAPS_II_Score"):
+        if column in rows.columns:
+            yield f"  {column}: latest {_fmt(rows[column].iloc[-1])}, max {_fmt(rows[column].max())}"
+
+    for column in vitals:
+        yield f"  {column}: min {_fmt(rows[column].min())}, max {_fmt(rows[column].max())}, trend {_trend(rows[column])}"
+
+    if "Timestamp" in rows.columns and (news is not None or "Condition" in rows.columns):
+        signals = rows.assign(NEWS_Score=news) if news is not None else rows
+        events = AlertConsolidator().process(signals.drop(columns="_time", errors="ignore"))
+        if not events.empty:
+            yield f"  Alerts ({len(events)} events):"
+            for _, event in events.tail(max_alerts).iloc[::-1].iterrows():
+                reasons = []
+                if "NEWS_Score" in event:
+                    reasons.append(f"NEWS {_fmt(event['NEWS_Score'])}")
+                if event.get("Condition", "Normal") != "Normal":
+                    reasons.append(event["Condition"])
+                yield f"    {event['Timestamp']} {event['Event']} {event['Alert_Level']} {' '.join(reasons)}".rstrip()
+
+
+def _fmt_time(value):
+    return "n/a" if pd.isna(value) else value.strftime("%Y-%m-%d %H:%M")
+
+
+def build_patient_digest(rows, budget_tokens=400, max_patients=5, max_alerts=5):
+    """Summarize matching vitals rows into at most `budget_tokens` tokens of text."""
+    if rows is None or len(rows) == 0:
+        return ""
+    if PATIENT_COLUMN in rows.columns:
+        groups = list(rows.groupby(PATIENT_COLUMN, sort=False))
+    else:
+        groups = [("(unnamed)", rows)]
+
+    # Keep room for the "+N more" line
+    budget = budget_tokens - 12
+    lines, used, skipped = [], 0, 0
+    for number, (patient, patient_rows) in enumerate(groups):
+        if number >= max_patients:
+            skipped = len(groups) - number
+            break
+        for line in _sections(patient, patient_rows, max_alerts):
+            cost = estimate_tokens(line) + 1
+            if used + cost > budget:
+                break
+            lines.append(line)
+            used += cost
+        else:
+            continue
+        skipped = len(groups) - number - 1
+        break
+    if skipped:
+        lines.append(f"(+{skipped} more matching patients not shown)")
+    return "\n".join(lines)
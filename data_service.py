@@ -0,0 +1,130 @@
+"""Shared, read-only vitals data for all Streamlit sessions.
+
+Every dashboard used to read and score its CSV inside each session, so memory
+grew with the number of connected nurses. `load_vitals` keeps one scored copy
+per file in the process-wide resource cache; sessions get the same
+`VitalsStore` object and read slices from it. Each entry remembers the
+file's modification time; when the file is appended to or replaced, the
+next rerun loads it again and the new store replaces the old one.
+
+The frames are shared between sessions: never modify them in place.
+"""
+import os
+import threading
+import pandas as pd
+import streamlit as st
+import profiling
+from scoring import score_frame, ConditionTracker
+from alerts import AlertConsolidator
+
+
+class VitalsStore:
+    """One loaded vitals file with the subsets the dashboards read most."""
+
+    def __init__(self, frame):
+        self.frame = frame
+        if "GatewayName" in frame.columns:
+            self.gateways = sorted(frame["GatewayName"].unique())
+            self._positions = frame.groupby("GatewayName").indices
+        else:
+            self.gateways = []
+            self._positions = {}
+        if "Condition" in frame.columns:
+            self.critical = frame[frame["Condition"] != "Normal"]
+        else:
+            self.critical = frame.iloc[0:0]
+        if "NEWS_Score" in frame.columns:
+            self.high_risk = frame[frame["NEWS_Score"] > 4]
+        else:
+            self.high_risk = frame.iloc[0:0]
+        self._alerts = {}
+        self._exported = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.frame)
+
+    def gateway(self, name, columns=None):
+        """Rows of one gateway, without scanning the whole frame."""
+        rows = self.frame.iloc[self._positions.get(name, [])]
+        return rows if columns is None else rows[list(columns)]
+
+    def alerts(self, **options):
+        """Consolidated alert events (see alerts.py), computed once per set of options."""
+        return self._consolidated(options)[0]
+
+    def alert_rows(self, **options):
+        """Number of rows at or above the alert threshold that `alerts` consolidated."""
+        return self._consolidated(options)[1]
+
+    def _consolidated(self, options):
+        key = tuple(sorted(options.items()))
+        with self._lock:
+            if key not in self._alerts:
+                consolidator = AlertConsolidator(**options)
+                rows = int((consolidator.levels(self.frame) >= consolidator.min_level).sum())
+                self._alerts[key] = (consolidator.process(self.frame), rows)
+            return self._alerts[key]
+
+    def export_alerts(self, path, **options):
+        """Write `alerts(**options)` to a CSV file once per store.
+
+        A reloaded file gives a new store, so `path` is rewritten with the
+        new alerts on the first export after every reload.
+        """
+        path = str(path)
+        events = self.alerts(**options)
+        key = (path, tuple(sorted(options.items())))
+        with self._lock:
+            if key not in self._exported:
+                events.to_csv(path, index=False)
+                self._exported.add(key)
+        return path
+
+    def memory_bytes(self):
+        return int(sum(part.memory_usage(deep=True).sum() for part in (self.frame, self.critical, self.high_risk)))
+
+
+def read_vitals(path, usecols=None, score=True, conditions=False, max_gap=15):
+    """Read and score a vitals CSV. This is the uncached loader behind `load_vitals`."""
+    if usecols is not None:
+        header = pd.read_csv(path, nrows=0).columns
+        missing = set(usecols) - set(header)
+        if missing:
+            raise ValueError(f"Dataset is missing required columns: {missing}")
+    with profiling.span("data.load_csv"):
+        frame = pd.read_csv(path, usecols=usecols)
+    profiling.incr("data_rows_loaded", len(frame))
+    if score:
+        with profiling.span("data.score"):
+            frame = score_frame(frame)
+    if conditions:
+        with profiling.span("data.conditions"):
+            frame = ConditionTracker(max_gap=max_gap).flag(frame)
+    return frame
+
+
+@st.cache_resource
+def _stores():
+    """Process-wide {(path, options): (mtime, VitalsStore)}, one entry per file and options."""
+    return {}, threading.Lock()
+
+
+def load_vitals(path, usecols=None, score=True, conditions=False, max_gap=15):
+    """Return the shared `VitalsStore` for `path`, (re)loading it when the file changed."""
+    profiling.incr("data_cache_requests")
+    usecols = tuple(usecols) if usecols else None
+    key = (path, usecols, score, conditions, max_gap)
+    mtime = os.path.getmtime(path)
+    stores, lock = _stores()
+    # Loading under the lock also keeps concurrent sessions from reading
+    # the same file twice
+    with lock:
+        entry = stores.get(key)
+        if entry is None or entry[0] != mtime:
+            profiling.incr("data_cache_misses")
+            with st.spinner("Loading ICU data..."):
+                frame = read_vitals(path, usecols=list(usecols) if usecols else None,
+                                    score=score, conditions=conditions, max_gap=max_gap)
+            entry = stores[key] = (mtime, VitalsStore(frame))
+        return entry[1]
@@ -0,0 +1,94 @@
+"""Sentence embedding service for the chatbot.
+
+Wraps the MiniLM SentenceTransformer with an LRU cache of query embeddings,
+so repeated questions skip the model, and optional quantized CPU variants:
+
+    "float32"  the full-precision model (what bot.py always used)
+    "int8"     torch dynamic int8 quantization of the Linear layers
+    "onnx"     the ONNX Runtime backend with the model's qint8 ONNX export
+               (sentence-transformers >= 3.2 with optimum[onnxruntime])
+
+Pick the variant with CAREWORX_ENCODER in .env.
+"""
+import threading
+from collections import OrderedDict
+import numpy as np
+import profiling
+
+VARIANTS = ("float32", "int8", "onnx")
+ONNX_INT8_FILE = "onnx/model_qint8_avx512_vnni.onnx"
+
+
+def load_model(name="all-MiniLM-L6-v2", variant="float32"):
+    from sentence_transformers import SentenceTransformer
+
+    if variant not in VARIANTS:
+        raise ValueError(f"Unknown encoder variant {variant!r}, expected one of {VARIANTS}")
+    if variant == "onnx":
+        return SentenceTransformer(name, device="cpu", backend="onnx", model_kwargs={"file_name": ONNX_INT8_FILE})
+    model = SentenceTransformer(name, device="cpu")
+    if variant == "int8":
+        import torch
+
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+class QueryEncoder:
+    """Encode texts with `model`, caching up to `cache_size` query embeddings."""
+
+    def __init__(self, model, cache_size=512, max_cached_batch=8):
+        self.model = model
+        self.cache_size = cache_size
+        self.max_cached_batch = max_cached_batch
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(text):
+        # MiniLM is uncased, so case and spacing do not change the embedding
+        return " ".join(text.lower().split())
+
+    def _encode(self, texts):
+        with profiling.span("encoder.model"):
+            return np.asarray(self.model.encode(texts), dtype=np.float32)
+
+    def encode(self, texts):
+        """Embeddings for `texts`; small batches (queries) go through the cache."""
+        if not len(texts):
+            return np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        if len(texts) > self.max_cached_batch or not self.cache_size:
+            return self._encode(texts)
+
+        keys = [self._key(text) for text in texts]
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._cache.get(key)
+                if vector is not None:
+                    self._cache.move_to_end(key)
+                    found[key] = vector
+            missing = list(dict.fromkeys(key for key in keys if key not in found))
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+        profiling.incr("encoder_cache_hits", len(keys) - len(missing))
+        profiling.incr("encoder_cache_misses", len(missing))
+
+        if missing:
+            vectors = self._encode(missing)
+            with self._lock:
+                for key, vector in zip(missing, vectors):
+                    vector.setflags(write=False)
+                    found[key] = vector
+                    self._cache[key] = vector
+                    self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return np.stack([found[key] for key in keys])
+
+    __call__ = encode
+
+    def cache_info(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._cache), "max_size": self.cache_size}
@@ -1,10 +1,10 @@
 import os 
-import pandas as pd
 from dotenv import load_dotenv
 from pathlib import Path
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
+import data_service
 
 
 load_dotenv()
@@ -23,29 +23,18 @@ if not os.path.exists(local_csv_path):
     st.stop()
 
 
-icu_df = pd.read_csv(local_csv_path)
-
-
-required_columns = {"GatewayName", "Timestamp", "HR"}
-missing_columns = required_columns - set(icu_df.columns)
-if missing_columns:
-    st.error(f"Dataset is missing required columns: {missing_columns}")
+# Load once per process and share between sessions. Identify critical
+# conditions based on HR change (ΔHR > 25 / < -15, any time gap)
+try:
+    store = data_service.load_vitals(local_csv_path, usecols=["GatewayName", "Timestamp", "HR"],
+                                     score=False, conditions=True, max_gap=None)
+except ValueError as e:
+    st.error(str(e))
     st.stop()
+icu_df = store.frame
 
-
-
-
-icu_df.sort_values(by=["GatewayName", "Timestamp"], inplace=True)
-
-# Calculate ΔHR (change in heart rate)
-icu_df["HR_Change"] = icu_df.groupby("GatewayName")["HR"].diff()
-
-# Identify critical conditions based on HR change
-icu_df["Condition"] = "Normal"
-icu_df.loc[icu_df["HR_Change"] > 25, "Condition"] = "Tachycardia"
-icu_df.loc[icu_df["HR_Change"] < -15, "Condition"] = "Bradycardia"
-
-critical_patients = icu_df[icu_df["Condition"] != "Normal"]
+# Repeated flags per gateway are folded into alert episodes
+alerts_df = store.alerts()
 
 # Streamlit UI
 def main():
@@ -57,22 +46,24 @@ def main():
 
     # Display critical patients based on filter
     if condition_filter == "All":
-        filtered_patients = critical_patients
+        filtered_patients = alerts_df
     else:
-        filtered_patients = critical_patients[critical_patients["Condition"] == condition_filter]
+        filtered_patients = alerts_df[alerts_df["Condition"] == condition_filter]
 
     if not filtered_patients.empty:
         st.subheader(f"⚠️ Critical Patients Detected ({condition_filter})")
         fig = go.Figure(data=[go.Table(
-            header=dict(values=["Gateway Name", "Timestamp", "Heart Rate", "ΔHR", "Condition"],
+            header=dict(values=["Gateway Name", "Timestamp", "Event", "Heart Rate", "ΔHR", "Condition", "Repeats"],
                         fill_color='lightblue',
                         align='center',
                         font=dict(color='black', size=14)),
             cells=dict(values=[filtered_patients.GatewayName, 
                                filtered_patients.Timestamp, 
+                               filtered_patients.Event,
                                filtered_patients.HR, 
                                filtered_patients.HR_Change,
-                               filtered_patients.Condition],
+                               filtered_patients.Condition,
+                               filtered_patients.Suppressed],
                        fill_color='white',
                        align='center',
                        font=dict(color='black', size=12)))
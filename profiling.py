@@ -0,0 +1,149 @@
+import os
+import time
+import threading
+from contextlib import nullcontext
+from functools import wraps
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+# Instrumentation is off unless CAREWORX_PROFILE is set (e.g. in .env)
+ENABLED = os.getenv("CAREWORX_PROFILE", "").strip().lower() in ("1", "true", "yes", "on")
+
+_lock = threading.Lock()
+_timings = {}   # span name -> [calls, total seconds, max seconds]
+_counters = {}  # counter name -> value
+_NOOP = nullcontext()
+
+
+def enable(flag=True):
+    """Turn instrumentation on or off at runtime."""
+    global ENABLED
+    ENABLED = bool(flag)
+
+
+def record(name, seconds):
+    """Add one timing sample for a span."""
+    with _lock:
+        stats = _timings.get(name)
+        if stats is None:
+            _timings[name] = [1, seconds, seconds]
+        else:
+            stats[0] += 1
+            stats[1] += seconds
+            if seconds > stats[2]:
+                stats[2] = seconds
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def span(name):
+    """Time a block of code: `with span("icu.load_csv"): ...`"""
+    if not ENABLED:
+        return _NOOP
+    return _Span(name)
+
+
+def timed(name=None):
+    """Decorator form of `span`; defaults to the function's qualified name."""
+    def decorator(func):
+        label = name or f"{func.__module__}.{func.__qualname__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(label, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def incr(name, value=1):
+    """Increase a counter such as rows processed or cache hits."""
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def snapshot():
+    """Return a copy of the collected timings and counters."""
+    with _lock:
+        timings = {
+            name: {"calls": calls, "total_s": total, "mean_s": total / calls, "max_s": peak}
+            for name, (calls, total, peak) in _timings.items()
+        }
+        counters = dict(_counters)
+    return {"timings": timings, "counters": counters}
+
+
+def reset():
+    with _lock:
+        _timings.clear()
+        _counters.clear()
+
+
+def _metric_name(name):
+    return "".join(c if c.isalnum() else "_" for c in name).lower()
+
+
+def prometheus_text(prefix="careworx"):
+    """Render the collected data in the Prometheus text exposition format."""
+    data = snapshot()
+    lines = []
+    if data["timings"]:
+        for metric, key, kind, help_text in (
+            ("span_calls_total", "calls", "counter", "Number of times the span ran."),
+            ("span_seconds_total", "total_s", "counter", "Total wall time spent in the span."),
+            ("span_seconds_max", "max_s", "gauge", "Slowest single run of the span."),
+        ):
+            lines.append(f"# HELP {prefix}_{metric} {help_text}")
+            lines.append(f"# TYPE {prefix}_{metric} {kind}")
+            for name, stats in sorted(data["timings"].items()):
+                lines.append(f'{prefix}_{metric}{{span="{name}"}} {stats[key]:.6g}')
+    for name, value in sorted(data["counters"].items()):
+        metric = f"{prefix}_{_metric_name(name)}_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def render_panel(container=None):
+    """Draw the diagnostics panel (timings, counters, Prometheus export) in Streamlit."""
+    if not ENABLED:
+        return
+    import pandas as pd
+    import streamlit as st
+
+    target = container if container is not None else st.sidebar
+    with target.expander("🩺 Diagnostics", expanded=False):
+        data = snapshot()
+        if data["timings"]:
+            timings = pd.DataFrame.from_dict(data["timings"], orient="index")
+            st.dataframe(timings.sort_values("total_s", ascending=False))
+        else:
+            st.write("No timings recorded yet.")
+        if data["counters"]:
+            st.json(data["counters"])
+        st.download_button("Download Prometheus metrics", prometheus_text(),
+                           file_name="careworx_metrics.prom", mime="text/plain")
+        if st.button("Reset diagnostics"):
+            reset()
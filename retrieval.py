@@ -0,0 +1,254 @@
+"""Hybrid BM25 + vector retrieval over the PDF knowledge base.
+
+Pages are split into short overlapping chunks tagged with their document,
+page and section heading. A query is answered from both a BM25 inverted
+index (exact drug names, threshold numbers) and the FAISS embedding index
+(paraphrases). The two candidate lists are fused with reciprocal rank
+fusion, reranked on embedding similarity plus keyword overlap, and
+deduplicated before the top chunks are returned.
+"""
+import os
+import re
+import math
+from collections import Counter, defaultdict
+import numpy as np
+import profiling
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it its of on or that the this to was what when "
+    "which who why with should does do can patient patients".split()
+)
+# Product quantization only pays off once the corpus outweighs its codebooks
+PQ_MIN_VECTORS = 2048
+HEADING_RE = re.compile(r"^(?:\d+(?:\.\d+)*\.?\s+)?[A-Z][A-Za-z0-9 ,&/()\-]{2,80}$")
+
+
+def tokenize(text):
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def _is_heading(line):
+    words = line.split()
+    return 0 < len(words) <= 10 and not line.endswith(".") and HEADING_RE.match(line) is not None \
+        and (line.isupper() or line.istitle() or line[0].isdigit())
+
+
+@profiling.timed("retrieval.load_pdfs")
+def load_pdfs(pdf_paths):
+    """(document, page number, text) for every page of the PDFs."""
+    import PyPDF2
+
+    pages = []
+    for pdf_path in pdf_paths:
+        with open(pdf_path, "rb") as file:
+            reader = PyPDF2.PdfReader(file)
+            for number, page in enumerate(reader.pages, 1):
+                pages.append((os.path.basename(pdf_path), number, page.extract_text()))
+    return pages
+
+
+def chunk_pages(pages, chunk_words=120, overlap=30):
+    """Split (document, page number, text) tuples into chunk dicts.
+
+    A chunk's section is the heading(s) its words fall under.
+    """
+    chunks = []
+    step = max(chunk_words - overlap, 1)
+    for document, page, text in pages:
+        words, sections = [], []
+        section = ""
+        for line in (text or "").splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            if _is_heading(line):
+                section = line
+            line_words = line.split()
+            words.extend(line_words)
+            sections.extend([section] * len(line_words))
+        for start in range(0, max(len(words) - overlap, 1), step):
+            end = min(start + chunk_words, len(words))
+            if start >= end:
+                break
+            chunks.append({
+                "text": " ".join(words[start:end]),
+                "document": document,
+                "page": page,
+                "section": " / ".join(dict.fromkeys(name for name in sections[start:end] if name)),
+                "start": start,
+                "end": end,
+            })
+    return chunks
+
+
+def make_vector_index(embeddings, compress=False, bytes_per_vector=None):
+    """FAISS index over unit-length embeddings.
+
+    With `compress`, large corpora are stored as product-quantization codes
+    (`bytes_per_vector` one-byte codes, default dimension / 8) instead of
+    float32 vectors; smaller corpora keep the exact IndexFlatL2.
+    """
+    import faiss
+
+    count, dimension = embeddings.shape
+    if compress and count >= PQ_MIN_VECTORS:
+        m = bytes_per_vector or dimension // 8
+        if dimension % m == 0:
+            index = faiss.IndexPQ(dimension, m, 8)
+            index.train(embeddings)
+            index.add(embeddings)
+            return index
+    index = faiss.IndexFlatL2(dimension)
+    index.add(embeddings)
+    return index
+
+
+class BM25Index:
+    """Okapi BM25 over an inverted index of chunk tokens."""
+
+    def __init__(self, texts, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)  # token -> [(chunk id, term frequency)]
+        self.lengths = np.zeros(len(texts), dtype=np.float32)
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text)
+            self.lengths[doc_id] = len(tokens)
+            for token, tf in Counter(tokens).items():
+                self.postings[token].append((doc_id, tf))
+        self.avg_length = float(self.lengths.mean()) if len(texts) else 0.0
+        n = len(texts)
+        self.idf = {
+            token: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for token, docs in self.postings.items()
+        }
+
+    def scores(self, query):
+        """Dict of chunk id -> BM25 score for every chunk sharing a term with the query."""
+        scores = defaultdict(float)
+        for token in set(tokenize(query)):
+            idf = self.idf.get(token)
+            if idf is None:
+                continue
+            for doc_id, tf in self.postings[token]:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / (self.avg_length or 1))
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+
+class HybridRetriever:
+    """BM25 + FAISS search with metadata filters, fusion, reranking and dedup."""
+
+    def __init__(self, chunks, encode, rrf_k=60, compress=False):
+        self.chunks = chunks
+        self.encode = encode
+        self.rrf_k = rrf_k
+        texts = [chunk["text"] for chunk in chunks]
+        with profiling.span("retrieval.build_bm25"):
+            self.bm25 = BM25Index(texts)
+        # PDFs without extractable text (scans) give no chunks: nothing to embed,
+        # and `search` returns no results
+        self.index = None
+        if texts:
+            with profiling.span("retrieval.build_faiss"):
+                embeddings = np.asarray(encode(texts), dtype=np.float32)
+                embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+                self.index = make_vector_index(embeddings, compress=compress)
+        self.documents = sorted({chunk["document"] for chunk in chunks})
+        self.sections = sorted({name for chunk in chunks for name in chunk["section"].split(" / ") if name})
+        profiling.incr("bot_chunks_indexed", len(chunks))
+
+    def _allowed(self, documents=None, section=None):
+        if not documents and not section:
+            return None
+        section = section.lower() if section else None
+        return {
+            i for i, chunk in enumerate(self.chunks)
+            if (not documents or chunk["document"] in documents)
+            and (not section or section in chunk["section"].lower())
+        }
+
+    def vector_search(self, query_embedding, k, allowed=None):
+        """Chunk ids by L2 distance; over-fetches when a filter is active."""
+        if self.index is None:
+            return []
+        fetch = self.index.ntotal if allowed is not None else min(k, self.index.ntotal)
+        _, indices = self.index.search(query_embedding.reshape(1, -1), fetch)
+        hits = [int(i) for i in indices[0] if i >= 0 and (allowed is None or i in allowed)]
+        return hits[:k]
+
+    def _overlaps(self, chunk, kept):
+        for other in kept:
+            if other["document"] == chunk["document"] and other["page"] == chunk["page"]:
+                shared = min(other["end"], chunk["end"]) - max(other["start"], chunk["start"])
+                if shared > 0.5 * (chunk["end"] - chunk["start"]):
+                    return True
+        return False
+
+    def search(self, query, top_k=3, candidates=20, documents=None, section=None):
+        """Return up to `top_k` chunk dicts (with a `score`) for the query."""
+        if not self.chunks:
+            return []
+        allowed = self._allowed(documents, section)
+        if allowed is not None and not allowed:
+            return []
+
+        with profiling.span("retrieval.bm25"):
+            bm25 = self.bm25.scores(query)
+            if allowed is not None:
+                bm25 = {i: s for i, s in bm25.items() if i in allowed}
+            keyword_hits = sorted(bm25, key=bm25.get, reverse=True)[:candidates]
+        with profiling.span("retrieval.encode_query"):
+            query_embedding = np.asarray(self.encode([query]), dtype=np.float32)[0]
+            query_embedding = query_embedding / max(float(np.linalg.norm(query_embedding)), 1e-12)
+        with profiling.span("retrieval.faiss"):
+            vector_hits = self.vector_search(query_embedding, candidates, allowed)
+
+        # Reciprocal rank fusion of both candidate lists
+        fused = defaultdict(float)
+        for hits in (keyword_hits, vector_hits):
+            for rank, i in enumerate(hits):
+                fused[i] += 1.0 / (self.rrf_k + rank + 1)
+
+        # Rerank: cosine similarity, normalized BM25, coverage of the query's terms and fused rank
+        with profiling.span("retrieval.rerank"):
+            query_terms = set(tokenize(query))
+            top_bm25 = max(bm25.values(), default=0.0) or 1.0
+            top_fused = max(fused.values())
+            ids = list(fused)
+            # Vectors come back from the index (decoded when PQ-compressed)
+            vectors = self.index.reconstruct_batch(np.asarray(ids, dtype=np.int64))
+            similarity = vectors @ query_embedding
+            ranked = []
+            for i, cosine in zip(ids, similarity):
+                chunk_terms = set(tokenize(self.chunks[i]["text"]))
+                coverage = len(query_terms & chunk_terms) / len(query_terms) if query_terms else 0.0
+                score = (0.4 * float(cosine)
+                         + 0.25 * bm25.get(i, 0.0) / top_bm25
+                         + 0.15 * coverage
+                         + 0.2 * fused[i] / top_fused)
+                ranked.append((score, i))
+            ranked.sort(reverse=True)
+
+        results, seen = [], set()
+        for score, i in ranked:
+            chunk = self.chunks[i]
+            key = " ".join(chunk["text"].lower().split())
+            if key in seen or self._overlaps(chunk, results):
+                continue
+            seen.add(key)
+            results.append(dict(chunk, score=round(float(score), 4)))
+            if len(results) == top_k:
+                break
+        profiling.incr("retrieval_chunks_returned", len(results))
+        return results
+
+
+def format_context(chunks):
+    """Join retrieved chunks with a short source line each."""
+    parts = []
+    for chunk in chunks:
+        source = f"[{chunk['document']} p.{chunk['page']}" + (f" - {chunk['section']}]" if chunk["section"] else "]")
+        parts.append(f"{source}\n{chunk['text']}")
+    return "\n\n".join(parts)
@@ -0,0 +1,216 @@
+"""Headless batch scoring for historical vitals exports.
+
+Streams CSV/Parquet files in chunks, adds NEWS / APACHE II / SAPS II scores,
+the warning message and the Tachycardia/Bradycardia condition flags, and
+writes the scored rows plus a JSON summary report and, with --alerts, the
+consolidated alert events (see alerts.py).
+
+    python score_vitals.py exports/2024-*.csv -o scored.csv --report summary.json --workers 4
+
+Input must be in time order per gateway (as monitors export it) so the
+condition flags can be carried from one chunk to the next.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from collections import deque, Counter
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from scoring import score_frame, news_bands, ConditionTracker
+from alerts import AlertConsolidator
+
+
+REQUIRED_COLUMNS = {"GatewayName", "Timestamp", "HR", "NIBP_Systolic", "NIBP_Diastolic", "SpO2", "RR"}
+# Read vitals as floats so every chunk has the same dtypes, even when a
+# later chunk contains gaps.
+NUMERIC_COLUMNS = ["HR", "NIBP_Systolic", "NIBP_Diastolic", "SpO2", "RR", "GCS", "Age"]
+
+
+def _is_parquet(path):
+    return path.lower().endswith((".parquet", ".pq"))
+
+
+def iter_chunks(path, chunksize):
+    """Yield DataFrames of at most `chunksize` rows from a CSV or Parquet file."""
+    if _is_parquet(path):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            sys.exit("Reading Parquet needs pyarrow: pip install pyarrow")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            chunk = batch.to_pandas()
+            for column in NUMERIC_COLUMNS:
+                if column in chunk.columns:
+                    chunk[column] = chunk[column].astype("float64")
+            yield chunk
+    else:
+        header = pd.read_csv(path, nrows=0).columns
+        dtype = {column: "float64" for column in NUMERIC_COLUMNS if column in header}
+        yield from pd.read_csv(path, chunksize=chunksize, dtype=dtype)
+
+
+class ScoredWriter:
+    """Append scored chunks to a CSV or Parquet file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._parquet = None
+        self._csv_header = True
+
+    def write(self, chunk):
+        if _is_parquet(self.path):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            if self._parquet is None:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            else:
+                table = pa.Table.from_pandas(chunk, schema=self._parquet.schema, preserve_index=False)
+            self._parquet.write_table(table)
+        else:
+            chunk.to_csv(self.path, mode="w" if self._csv_header else "a", header=self._csv_header, index=False)
+            self._csv_header = False
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+class Summary:
+    """Running totals for the report; memory grows with gateways, not rows."""
+
+    def __init__(self):
+        self.rows = 0
+        self.chunks = 0
+        self.bands = Counter()
+        self.conditions = Counter()
+        self.score_max = {}
+        self.score_sum = Counter()
+        self.gateways = {}  # GatewayName -> [rows, max NEWS, high risk rows, critical rows]
+
+    def add(self, chunk):
+        self.rows += len(chunk)
+        self.chunks += 1
+        bands = news_bands(chunk["NEWS_Score"])
+        self.bands.update(bands.value_counts().to_dict())
+        self.conditions.update(chunk["Condition"].value_counts().to_dict())
+        for column in ("NEWS_Score", "APACHE_II_Score", "SAPS_II_Score"):
+            if column in chunk.columns:
+                self.score_sum[column] += float(chunk[column].sum())
+                peak = chunk[column].max()
+                if pd.notna(peak):
+                    self.score_max[column] = max(self.score_max.get(column, peak), peak)
+
+        per_gateway = pd.DataFrame({
+            "GatewayName": chunk["GatewayName"],
+            "rows": 1,
+            "max_news": chunk["NEWS_Score"],
+            "high_risk": chunk["NEWS_Score"] > 4,
+            "critical": chunk["Condition"] != "Normal",
+        }).groupby("GatewayName").agg({"rows": "sum", "max_news": "max", "high_risk": "sum", "critical": "sum"})
+        for gateway, row in per_gateway.iterrows():
+            stats = self.gateways.setdefault(gateway, [0, 0, 0, 0])
+            stats[0] += int(row["rows"])
+            stats[1] = max(stats[1], int(row["max_news"]))
+            stats[2] += int(row["high_risk"])
+            stats[3] += int(row["critical"])
+
+    def report(self, elapsed, top=20):
+        worst = sorted(self.gateways.items(), key=lambda item: (item[1][1], item[1][2]), reverse=True)[:top]
+        return {
+            "rows": self.rows,
+            "chunks": self.chunks,
+            "gateways": len(self.gateways),
+            "elapsed_s": round(elapsed, 3),
+            "rows_per_s": round(self.rows / elapsed, 1) if elapsed else None,
+            "news_bands": dict(self.bands),
+            "conditions": dict(self.conditions),
+            "high_risk_rows": sum(stats[2] for stats in self.gateways.values()),
+            "score_mean": {column: total / self.rows for column, total in self.score_sum.items()} if self.rows else {},
+            "score_max": {column: float(value) for column, value in self.score_max.items()},
+            "top_gateways": [
+                {"GatewayName": gateway, "rows": rows, "max_news": max_news, "high_risk_rows": high_risk, "critical_rows": critical}
+                for gateway, (rows, max_news, high_risk, critical) in worst
+            ],
+        }
+
+
+def _scored_chunks(chunks, workers):
+    """Score chunks in a process pool, keeping order and at most 2 chunks per worker in flight."""
+    if workers <= 1:
+        for chunk in chunks:
+            yield score_frame(chunk)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(score_frame, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _checked_chunks(paths, chunksize):
+    for path in paths:
+        for chunk in iter_chunks(path, chunksize):
+            missing = REQUIRED_COLUMNS - set(chunk.columns)
+            if missing:
+                sys.exit(f"{path} is missing required columns: {sorted(missing)}")
+            yield chunk
+
+
+def run(paths, output, chunksize=100_000, workers=1, max_gap=15, report_path=None, alerts_path=None):
+    start = time.perf_counter()
+    tracker = ConditionTracker(max_gap=max_gap)
+    writer = ScoredWriter(output)
+    consolidator = AlertConsolidator() if alerts_path else None
+    alerts_writer = ScoredWriter(alerts_path) if alerts_path else None
+    summary = Summary()
+    try:
+        for scored in _scored_chunks(_checked_chunks(paths, chunksize), workers):
+            flagged = tracker.flag(scored)
+            writer.write(flagged)
+            summary.add(flagged)
+            if consolidator is not None:
+                events = consolidator.process(flagged)
+                if not events.empty:
+                    alerts_writer.write(events)
+    finally:
+        writer.close()
+        if alerts_writer is not None:
+            alerts_writer.close()
+
+    report = summary.report(time.perf_counter() - start)
+    report["inputs"] = list(paths)
+    report["output"] = output
+    if consolidator is not None:
+        report["alerts"] = {"path": alerts_path, "events": consolidator.events_out, "rows_per_event": round(consolidator.reduction(), 1)}
+    if report_path:
+        with open(report_path, "w") as file:
+            json.dump(report, file, indent=4)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score historical ICU vitals exports (NEWS, APACHE II, SAPS II, HR conditions).")
+    parser.add_argument("inputs", nargs="+", help="CSV or Parquet vitals files, processed in the given order")
+    parser.add_argument("-o", "--output", required=True, help="Scored output file (.csv or .parquet)")
+    parser.add_argument("--report", help="Write the JSON summary report here")
+    parser.add_argument("--alerts", help="Also write consolidated alert events (.csv or .parquet) here")
+    parser.add_argument("--chunksize", type=int, default=100_000, help="Rows per chunk (default: 100000)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Scoring processes (default: CPU count)")
+    parser.add_argument("--max-gap", type=float, default=15, help="Max seconds between readings for an HR change to count (default: 15)")
+    args = parser.parse_args(argv)
+
+    report = run(args.inputs, args.output, chunksize=args.chunksize, workers=args.workers,
+                 max_gap=args.max_gap, report_path=args.report, alerts_path=args.alerts)
+    print(f"Scored {report['rows']} rows from {report['gateways']} gateways in {report['elapsed_s']}s "
+          f"({report['rows_per_s']} rows/s); {report['high_risk_rows']} high-risk rows -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+import numpy as np
+import pandas as pd
+
+
+# NEWS Score Calculation
+def calculate_news(hr, systolic_bp, diastolic_bp, spo2, rr):
+    score = 0
+    if rr <= 8 or rr >= 25:
+        score += 3
+    elif 9 <= rr <= 11 or 21 <= rr <= 24:
+        score += 2
+    elif 12 <= rr <= 20:
+        score += 0
+    if spo2 <= 91:
+        score += 3
+    elif 92 <= spo2 <= 93:
+        score += 2
+    elif 94 <= spo2 <= 95:
+        score += 1
+    elif spo2 >= 96:
+        score += 0
+    if systolic_bp <= 90 or systolic_bp >= 220:
+        score += 3
+    elif 91 <= systolic_bp <= 100:
+        score += 2
+    elif 101 <= systolic_bp <= 110:
+        score += 1
+    elif 111 <= systolic_bp <= 219:
+        score += 0
+    if hr <= 40 or hr >= 131:
+        score += 3
+    elif 41 <= hr <= 50 or 111 <= hr <= 130:
+        score += 2
+    elif 51 <= hr <= 90:
+        score += 0
+    elif 91 <= hr <= 110:
+        score += 1
+    return score
+
+
+WARNING_MESSAGES = {
+    "high": "🚨 High risk! Immediate medical intervention required.",
+    "medium": "⚠️ Medium risk. Consider closer observation.",
+    "low": "ℹ️ Low risk, monitor periodically.",
+    "none": "🟢 No immediate risk detected.",
+}
+
+
+def news_band(score):
+    if score > 6:
+        return "high"
+    elif 4 < score <= 6:
+        return "medium"
+    elif 1 <= score <= 4:
+        return "low"
+    else:
+        return "none"
+
+
+def get_warning_message(score):
+    return WARNING_MESSAGES[news_band(score)]
+
+
+# APACHE II Score Calculation
+def calculate_apache(hr, systolic_bp, age, gcs):
+    score = 0
+    if hr < 40 or hr > 180:
+        score += 4
+    elif 40 <= hr < 55 or 140 <= hr <= 180:
+        score += 3
+    elif 55 <= hr < 70 or 110 <= hr < 140:
+        score += 2
+    if systolic_bp < 70 or systolic_bp > 200:
+        score += 4
+    elif 70 <= systolic_bp < 80 or 180 <= systolic_bp <= 200:
+        score += 3
+    elif 80 <= systolic_bp < 100 or 160 <= systolic_bp < 180:
+        score += 2
+    if gcs:
+        score += (15 - gcs)
+    if age > 75:
+        score += 6
+    elif 65 <= age <= 74:
+        score += 5
+    elif 55 <= age <= 64:
+        score += 3
+    elif 45 <= age <= 54:
+        score += 2
+    return score
+
+
+# SAPS II Score Calculation
+def calculate_saps(hr, systolic_bp, age, gcs):
+    score = 0
+    if hr > 160 or hr < 40:
+        score += 8
+    elif 40 <= hr < 70 or 120 <= hr <= 160:
+        score += 5
+    if systolic_bp < 70:
+        score += 13
+    elif 70 <= systolic_bp < 100:
+        score += 5
+    if gcs:
+        score += (15 - gcs) * 2
+    if age > 75:
+        score += 6
+    elif 65 <= age <= 74:
+        score += 5
+    elif 55 <= age <= 64:
+        score += 3
+    elif 45 <= age <= 54:
+        score += 2
+    return score
+
+
+# Column-wise versions of the calculators above. They follow the same
+# if/elif order (np.select picks the first matching band) so results are
+# identical to df.apply(...) with the scalar functions, NaN handling included.
+
+def _age_points(age):
+    return np.select(
+        [age > 75, (age >= 65) & (age <= 74), (age >= 55) & (age <= 64), (age >= 45) & (age <= 54)],
+        [6, 5, 3, 2], 0)
+
+
+def news_scores(df):
+    hr, sbp, spo2, rr = df["HR"], df["NIBP_Systolic"], df["SpO2"], df["RR"]
+    score = np.select([(rr <= 8) | (rr >= 25), ((rr >= 9) & (rr <= 11)) | ((rr >= 21) & (rr <= 24))], [3, 2], 0)
+    score = score + np.select([spo2 <= 91, (spo2 >= 92) & (spo2 <= 93), (spo2 >= 94) & (spo2 <= 95)], [3, 2, 1], 0)
+    score = score + np.select([(sbp <= 90) | (sbp >= 220), (sbp >= 91) & (sbp <= 100), (sbp >= 101) & (sbp <= 110)], [3, 2, 1], 0)
+    score = score + np.select(
+        [(hr <= 40) | (hr >= 131), ((hr >= 41) & (hr <= 50)) | ((hr >= 111) & (hr <= 130)), (hr >= 91) & (hr <= 110)],
+        [3, 2, 1], 0)
+    return pd.Series(score, index=df.index)
+
+
+def apache_scores(df):
+    hr, sbp, age, gcs = df["HR"], df["NIBP_Systolic"], df["Age"], df["GCS"]
+    score = np.select(
+        [(hr < 40) | (hr > 180), ((hr >= 40) & (hr < 55)) | ((hr >= 140) & (hr <= 180)), ((hr >= 55) & (hr < 70)) | ((hr >= 110) & (hr < 140))],
+        [4, 3, 2], 0)
+    score = score + np.select(
+        [(sbp < 70) | (sbp > 200), ((sbp >= 70) & (sbp < 80)) | ((sbp >= 180) & (sbp <= 200)), ((sbp >= 80) & (sbp < 100)) | ((sbp >= 160) & (sbp < 180))],
+        [4, 3, 2], 0)
+    # `if gcs:` is true for NaN as well, which makes the scalar score NaN
+    score = score + np.where(gcs != 0, 15 - gcs, 0)
+    return pd.Series(score + _age_points(age), index=df.index)
+
+
+def saps_scores(df):
+    hr, sbp, age, gcs = df["HR"], df["NIBP_Systolic"], df["Age"], df["GCS"]
+    score = np.select([(hr > 160) | (hr < 40), ((hr >= 40) & (hr < 70)) | ((hr >= 120) & (hr <= 160))], [8, 5], 0)
+    score = score + np.select([sbp < 70, (sbp >= 70) & (sbp < 100)], [13, 5], 0)
+    score = score + np.where(gcs != 0, (15 - gcs) * 2, 0)
+    return pd.Series(score + _age_points(age), index=df.index)
+
+
+def news_bands(scores):
+    return pd.Series(
+        np.select([scores > 6, (scores > 4) & (scores <= 6), (scores >= 1) & (scores <= 4)], ["high", "medium", "low"], "none"),
+        index=scores.index)
+
+
+def warning_messages(scores):
+    return news_bands(scores).map(WARNING_MESSAGES)
+
+
+def score_frame(df):
+    """Add NEWS, APACHE II and SAPS II scores and the warning message to a vitals frame.
+
+    APACHE II and SAPS II are skipped when the frame has no Age/GCS columns.
+    """
+    df = df.copy()
+    df["NEWS_Score"] = news_scores(df)
+    if {"Age", "GCS"}.issubset(df.columns):
+        df["APACHE_II_Score"] = apache_scores(df)
+        df["SAPS_II_Score"] = saps_scores(df)
+    df["Warning_Message"] = warning_messages(df["NEWS_Score"])
+    return df
+
+
+class ConditionTracker:
+    """Tachycardia/Bradycardia detection from HR change between consecutive readings.
+
+    Keeps the last reading of every gateway, so a file can be fed in chunks and
+    the first row of a chunk is still compared with the previous one. Chunks
+    must arrive in time order per gateway.
+    """
+
+    def __init__(self, max_gap=15, rise=25, drop=-15):
+        self.max_gap = max_gap
+        self.rise = rise
+        self.drop = drop
+        self.last = {}  # GatewayName -> (Timestamp, HR)
+
+    def flag(self, df):
+        df = df.copy()
+        df["Timestamp"] = pd.to_datetime(df["Timestamp"])
+        df.sort_values(by=["GatewayName", "Timestamp"], inplace=True, kind="stable")
+
+        groups = df.groupby("GatewayName", sort=False)
+        prev_ts = groups["Timestamp"].shift()
+        prev_hr = groups["HR"].shift()
+        if self.last:
+            first = ~df["GatewayName"].duplicated()
+            carried = df.loc[first, "GatewayName"].map(self.last)
+            known = carried.dropna()
+            prev_ts.loc[known.index] = pd.to_datetime([ts for ts, _ in known])
+            prev_hr.loc[known.index] = [hr for _, hr in known]
+
+        df["Time_Diff"] = (df["Timestamp"] - prev_ts).dt.total_seconds()
+        df["HR_Change"] = df["HR"] - prev_hr
+        df["Condition"] = "Normal"
+        recent = df["Time_Diff"] <= self.max_gap if self.max_gap is not None else True
+        df.loc[(df["HR_Change"] > self.rise) & recent, "Condition"] = "Tachycardia"
+        df.loc[(df["HR_Change"] < self.drop) & recent, "Condition"] = "Bradycardia"
+
+        tail = df.drop_duplicates("GatewayName", keep="last")
+        self.last.update(zip(tail["GatewayName"], zip(tail["Timestamp"], tail["HR"])))
+        return df
+
+
+def flag_conditions(df, max_gap=15):
+    return ConditionTracker(max_gap=max_gap).flag(df)
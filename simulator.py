@@ -0,0 +1,417 @@
+"""Local vitals simulator and load generator for the dashboards.
+
+Two sources:
+
+    replay  re-emit a recorded vitals CSV at a chosen speed-up
+    synth   generate many gateways with drifting HR/SpO2/RR/BP and random
+            deterioration episodes (sepsis, hypoxia, brady/tachy-arrhythmia,
+            hypertensive crisis)
+
+and three sinks, usable together:
+
+    --out FILE         append CSV rows to FILE (the dashboards re-read it when it changes)
+    --tcp HOST:PORT    serve newline-delimited CSV (header first) to every client that connects
+    --stdout           print CSV rows
+
+Examples:
+
+    python simulator.py synth --gateways 200 --interval 5 --speed 60 --out icu_updated_v2.csv
+    python simulator.py replay criticalcases.csv --speed 10 --retime --tcp 127.0.0.1:9009
+    python simulator.py synth --gateways 1000 --speed 0 --duration 86400 --out load.csv   # as fast as possible
+"""
+import os
+import re
+import sys
+import time
+import socket
+import argparse
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+COLUMNS = ["GatewayName", "HR", "NIBP_Systolic", "NIBP_Diastolic", "SpO2", "RR", "Timestamp", "GCS", "Age"]
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Exports cut to minutes:seconds within the hour (criticalcases.csv: "59:59.0").
+# pandas would read these as HH:MM, so they get an explicit format.
+MINUTE_FORMATS = [(re.compile(r"\d{1,2}:\d{2}\.\d+"), "%M:%S.%f"), (re.compile(r"\d{1,2}:\d{2}"), "%M:%S")]
+
+# Vital: (population mean of the baseline, spread of baselines, mean reversion per minute, noise per sqrt(minute), min, max)
+VITALS = {
+    "HR": (80, 10, 0.3, 3.0, 20, 220),
+    "NIBP_Systolic": (122, 12, 0.2, 4.0, 50, 250),
+    "NIBP_Diastolic": (76, 8, 0.2, 3.0, 25, 150),
+    "SpO2": (97, 1.2, 0.5, 0.6, 60, 100),
+    "RR": (16, 2, 0.4, 1.0, 4, 50),
+}
+VITAL_NAMES = list(VITALS)
+
+# Deterioration episodes: offsets at full severity and (min, max) ramp-up seconds
+EPISODES = {
+    "sepsis": ({"HR": 35, "RR": 10, "NIBP_Systolic": -35, "NIBP_Diastolic": -20, "SpO2": -5}, (600, 1800)),
+    "hypoxia": ({"SpO2": -12, "RR": 8, "HR": 15}, (300, 900)),
+    "bradyarrhythmia": ({"HR": -40, "NIBP_Systolic": -20, "NIBP_Diastolic": -10}, (5, 15)),
+    "tachyarrhythmia": ({"HR": 60, "NIBP_Systolic": -10}, (5, 15)),
+    "hypertensive": ({"NIBP_Systolic": 65, "NIBP_Diastolic": 30, "HR": 10}, (300, 1200)),
+}
+EPISODE_NAMES = list(EPISODES)
+
+
+class VitalsSynthesizer:
+    """Mean-reverting (Ornstein-Uhlenbeck) vitals per gateway with deterioration episodes."""
+
+    def __init__(self, gateways=50, episodes_per_hour=0.3, dropout=0.01, artifact_rate=0.002, seed=None,
+                 prefix="Sim-hsp-2024-01-"):
+        self.rng = np.random.default_rng(seed)
+        n = gateways
+        self.names = np.array([f"{prefix}{i:03d}" for i in range(n)])
+        self.baseline = np.column_stack([
+            self.rng.normal(mean, spread, n) for mean, spread, *_ in VITALS.values()
+        ])
+        self.state = self.baseline.copy()
+        self.theta = np.array([spec[2] for spec in VITALS.values()])
+        self.sigma = np.array([spec[3] for spec in VITALS.values()])
+        self.low = np.array([spec[4] for spec in VITALS.values()])
+        self.high = np.array([spec[5] for spec in VITALS.values()])
+        self.age = self.rng.integers(18, 95, n)
+        self.gcs = np.where(self.rng.random(n) < 0.8, 15, self.rng.integers(8, 15, n))
+        self.offsets = np.array([[EPISODES[name][0].get(vital, 0) for vital in VITAL_NAMES] for name in EPISODE_NAMES])
+
+        self.episodes_per_hour = episodes_per_hour
+        self.dropout = dropout
+        self.artifact_rate = artifact_rate
+        # Per-gateway episode: type (-1 none), elapsed seconds, ramp, plateau, recovery, severity
+        self.kind = np.full(n, -1)
+        self.elapsed = np.zeros(n)
+        self.ramp = np.zeros(n)
+        self.plateau = np.zeros(n)
+        self.recovery = np.zeros(n)
+        self.severity = np.zeros(n)
+
+    def _start_episodes(self, dt):
+        idle = self.kind < 0
+        starting = idle & (self.rng.random(len(self.kind)) < self.episodes_per_hour * dt / 3600)
+        count = int(starting.sum())
+        if not count:
+            return
+        kinds = self.rng.integers(0, len(EPISODE_NAMES), count)
+        self.kind[starting] = kinds
+        self.elapsed[starting] = 0
+        self.ramp[starting] = [self.rng.uniform(*EPISODES[EPISODE_NAMES[k]][1]) for k in kinds]
+        self.plateau[starting] = self.rng.uniform(300, 1800, count)
+        self.recovery[starting] = self.rng.uniform(300, 1200, count)
+        self.severity[starting] = self.rng.uniform(0.5, 1.2, count)
+
+    def _envelope(self):
+        """0..1 strength of each gateway's episode: ramp up, plateau, recover."""
+        t, ramp, plateau, recovery = self.elapsed, self.ramp, self.plateau, self.recovery
+        rising = np.clip(t / np.maximum(ramp, 1), 0, 1)
+        falling = np.clip(1 - (t - ramp - plateau) / np.maximum(recovery, 1), 0, 1)
+        return np.where(self.kind < 0, 0.0, np.minimum(rising, falling))
+
+    def step(self, dt):
+        """Advance `dt` seconds and return the new readings as a DataFrame (without Timestamp)."""
+        self._start_episodes(dt)
+        active = self.kind >= 0
+        self.elapsed[active] += dt
+
+        envelope = self._envelope() * self.severity
+        offset = np.zeros_like(self.state)
+        offset[active] = self.offsets[self.kind[active]] * envelope[active, None]
+        target = self.baseline + offset
+
+        minutes = dt / 60
+        decay = np.exp(-self.theta * minutes)
+        noise = self.rng.standard_normal(self.state.shape) * self.sigma * np.sqrt(minutes)
+        self.state = target + (self.state - target) * decay + noise
+        # Arrhythmias switch rate abruptly rather than drifting towards it
+        abrupt = active & np.isin(self.kind, [EPISODE_NAMES.index("bradyarrhythmia"), EPISODE_NAMES.index("tachyarrhythmia")])
+        self.state[abrupt, 0] = target[abrupt, 0] + noise[abrupt, 0]
+
+        finished = active & (self.elapsed >= self.ramp + self.plateau + self.recovery)
+        self.kind[finished] = -1
+
+        values = np.clip(self.state, self.low, self.high)
+        # Motion artifacts: single implausible readings, as real monitors produce
+        artifacts = self.rng.random(values.shape) < self.artifact_rate
+        values = np.where(artifacts, values * self.rng.uniform(0.5, 1.5, values.shape), values)
+        values = np.clip(np.round(values), self.low, self.high)
+        values[:, 3] = np.minimum(values[:, 3], 100)
+
+        gcs = self.gcs - np.where(active & (self.kind == EPISODE_NAMES.index("sepsis")), np.round(3 * envelope), 0)
+        frame = pd.DataFrame(values.astype(int), columns=VITAL_NAMES)
+        frame.insert(0, "GatewayName", self.names)
+        frame["GCS"] = np.clip(gcs, 3, 15).astype(int)
+        frame["Age"] = self.age
+        # Some gateways miss a reading now and then
+        return frame[self.rng.random(len(frame)) >= self.dropout]
+
+
+class FileSink:
+    """Append CSV rows to a file, writing the header only if the file is new or empty.
+
+    Rows appended to an existing file follow that file's column order; its
+    extra columns are left empty. A file missing any of `COLUMNS` is refused
+    rather than appended to with misaligned values.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.header = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.columns = None
+        if not self.header:
+            self.columns = list(pd.read_csv(path, nrows=0).columns)
+            missing = [column for column in COLUMNS if column not in self.columns]
+            if missing:
+                raise ValueError(f"{path} has no column(s) {missing}; refusing to append to it")
+
+    def write(self, frame):
+        if self.columns is not None:
+            frame = frame.reindex(columns=self.columns)
+        frame.to_csv(self.path, mode="a", header=self.header, index=False)
+        self.header = False
+
+    def close(self):
+        pass
+
+
+class TcpSink:
+    """Serve newline-delimited CSV to any number of local clients (e.g. `nc 127.0.0.1 9009`)."""
+
+    def __init__(self, address):
+        host, port = address.rsplit(":", 1)
+        self.server = socket.create_server((host, int(port)))
+        self.clients = []
+        self.lock = threading.Lock()
+        self.header = (",".join(COLUMNS) + "\n").encode()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self.server.accept()
+            except OSError:
+                return
+            try:
+                client.sendall(self.header)
+            except OSError:
+                client.close()
+                continue
+            with self.lock:
+                self.clients.append(client)
+
+    def write(self, frame):
+        payload = frame.to_csv(header=False, index=False).encode()
+        with self.lock:
+            for client in list(self.clients):
+                try:
+                    client.sendall(payload)
+                except OSError:
+                    client.close()
+                    self.clients.remove(client)
+
+    def close(self):
+        self.server.close()
+        with self.lock:
+            for client in self.clients:
+                client.close()
+
+
+class StdoutSink:
+    def __init__(self):
+        self.header = True
+
+    def write(self, frame):
+        frame.to_csv(sys.stdout, header=self.header, index=False)
+        sys.stdout.flush()
+        self.header = False
+
+    def close(self):
+        pass
+
+
+class Pacer:
+    """Sleeps so simulated time runs `speed` times faster than the wall clock (0 = no sleeping)."""
+
+    def __init__(self, speed):
+        self.speed = speed
+        self.wall_start = time.monotonic()
+        self.sim_elapsed = 0.0
+
+    def advance(self, seconds):
+        self.sim_elapsed += seconds
+        if self.speed > 0:
+            delay = self.wall_start + self.sim_elapsed / self.speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+
+class Stats:
+    def __init__(self, every=10.0):
+        self.every = every
+        self.rows = 0
+        self.start = self.last = time.monotonic()
+
+    def add(self, rows):
+        self.rows += rows
+        now = time.monotonic()
+        if now - self.last >= self.every:
+            self.last = now
+            print(f"{self.rows} rows, {self.rows / (now - self.start):.0f} rows/s", file=sys.stderr)
+
+
+def emit(sinks, frame, stats):
+    for sink in sinks:
+        sink.write(frame[COLUMNS])
+    stats.add(len(frame))
+
+
+def run_synth(args, sinks):
+    synth = VitalsSynthesizer(gateways=args.gateways, episodes_per_hour=args.episodes_per_hour,
+                              dropout=args.dropout, artifact_rate=args.artifact_rate, seed=args.seed)
+    clock = datetime.fromisoformat(args.start) if args.start else datetime.now().replace(microsecond=0)
+    pacer, stats = Pacer(args.speed), Stats()
+    elapsed = 0.0
+    while args.duration is None or elapsed < args.duration:
+        frame = synth.step(args.interval)
+        # Readings within a tick are spread over the interval, like unsynchronized monitors
+        jitter = synth.rng.uniform(0, args.interval, len(frame))
+        frame["Timestamp"] = [(clock + timedelta(seconds=offset)).strftime(TIME_FORMAT) for offset in jitter]
+        emit(sinks, frame.sort_values("Timestamp", kind="stable"), stats)
+        clock += timedelta(seconds=args.interval)
+        elapsed += args.interval
+        pacer.advance(args.interval)
+
+
+def detect_time_format(values):
+    """strptime format for a minutes:seconds Timestamp column, or None to let pandas infer it."""
+    sample = values.dropna().astype(str).str.strip().head(1000)
+    for pattern, time_format in MINUTE_FORMATS:
+        if len(sample) and sample.str.fullmatch(pattern).all():
+            return time_format
+    return None
+
+
+def fill_times(times, previous, interval):
+    """Place unparseable timestamps `interval` seconds apart after the last parsed one."""
+    missing = times.isna()
+    steps = missing.groupby((~missing).cumsum()).cumsum() * interval
+    anchor = times.ffill()
+    if previous is None:
+        # Leading gap of the file: count back from the first parsed timestamp
+        leading = int(anchor.isna().sum())
+        previous = times.dropna().iloc[0] - pd.Timedelta(seconds=interval * (leading + 1))
+    anchor = anchor.fillna(previous)
+    return times.where(~missing, anchor + pd.to_timedelta(steps, unit="s"))
+
+
+def run_replay(args, sinks):
+    pacer, stats = Pacer(args.speed), Stats()
+    clock_start = pd.Timestamp(datetime.now().replace(microsecond=0))
+    shift = None        # added to the file's timestamps
+    first_raw = None    # first and last timestamp of the file, for looping
+    last_raw = None
+    previous = None     # last emitted (shifted) timestamp
+    previous_raw = None  # last file timestamp of the pass, before shifting
+    time_format, detected = args.time_format, args.time_format is not None
+    row_number = 0
+    while True:
+        for chunk in pd.read_csv(args.csv, chunksize=args.chunksize):
+            chunk = chunk.drop(columns=[c for c in chunk.columns if c.startswith("Unnamed")])
+            times = None
+            if "Timestamp" in chunk:
+                if not detected:
+                    time_format, detected = detect_time_format(chunk["Timestamp"]), True
+                times = pd.to_datetime(chunk["Timestamp"], format=time_format, errors="coerce")
+            if times is None or (times.isna().all() and previous_raw is None):
+                # No usable clock in the file: one row every --interval seconds
+                steps = np.arange(row_number, row_number + len(chunk)) * args.interval
+                times = pd.Series(clock_start + pd.to_timedelta(steps, unit="s"), index=chunk.index)
+            elif times.isna().any():
+                print(f"{times.isna().sum()} timestamps in rows {row_number}-{row_number + len(chunk) - 1} could not be parsed "
+                      f"(format {time_format or 'inferred'}); spacing them --interval {args.interval:g}s after the previous reading",
+                      file=sys.stderr)
+                times = fill_times(times, previous_raw, args.interval)
+            previous_raw = times.iloc[-1]
+            row_number += len(chunk)
+            if first_raw is None:
+                first_raw = times.min()
+                shift = clock_start - first_raw if args.retime else pd.Timedelta(0)
+            last_raw = max(last_raw, times.max()) if last_raw is not None else times.max()
+            times = times + shift
+            chunk = chunk.assign(Timestamp=times.dt.strftime(TIME_FORMAT))
+            for column in COLUMNS:
+                if column not in chunk.columns:
+                    chunk[column] = np.nan
+            # Emit rows sharing a timestamp together, sleeping for the gaps between them
+            for stamp, rows in chunk.groupby(times, sort=True):
+                if previous is not None:
+                    pacer.advance(max((stamp - previous).total_seconds(), 0))
+                previous = stamp
+                emit(sinks, rows, stats)
+        if not args.loop or first_raw is None:
+            break
+        # Next pass continues after this one instead of repeating its timestamps
+        shift += last_raw - first_raw + pd.Timedelta(seconds=args.interval)
+        previous_raw = None
+        row_number = 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay or synthesize ICU vitals for local load testing.")
+    sub = parser.add_subparsers(dest="source", required=True)
+
+    synth = sub.add_parser("synth", help="Generate synthetic gateways")
+    synth.add_argument("--gateways", type=int, default=50)
+    synth.add_argument("--interval", type=float, default=5, help="Seconds between readings per gateway (default: 5)")
+    synth.add_argument("--episodes-per-hour", type=float, default=0.3, help="Deterioration episodes per gateway per hour")
+    synth.add_argument("--dropout", type=float, default=0.01, help="Share of readings that are missed")
+    synth.add_argument("--artifact-rate", type=float, default=0.002, help="Share of values replaced by motion artifacts")
+    synth.add_argument("--duration", type=float, help="Simulated seconds to run (default: until interrupted)")
+    synth.add_argument("--start", help="Simulated start time, ISO format (default: now)")
+    synth.add_argument("--seed", type=int)
+
+    replay = sub.add_parser("replay", help="Replay a recorded vitals CSV")
+    replay.add_argument("csv")
+    replay.add_argument("--interval", type=float, default=1, help="Seconds between rows when the file has no usable timestamps")
+    replay.add_argument("--time-format", help="strptime format of the file's Timestamp column (default: "
+                        "%%M:%%S.%%f for minutes:seconds exports, otherwise inferred); minutes:seconds "
+                        "times fall on 1900-01-01, so combine them with --retime")
+    replay.add_argument("--retime", action="store_true", help="Shift timestamps so the replay starts now")
+    replay.add_argument("--loop", action="store_true", help="Start over at the end of the file")
+    replay.add_argument("--chunksize", type=int, default=50_000)
+
+    for command in (synth, replay):
+        command.add_argument("--speed", type=float, default=1, help="Simulated seconds per wall-clock second; 0 = as fast as possible")
+        command.add_argument("--out", help="Append CSV rows to this file")
+        command.add_argument("--tcp", help="Serve CSV rows on HOST:PORT")
+        command.add_argument("--stdout", action="store_true", help="Print CSV rows")
+    args = parser.parse_args(argv)
+
+    sinks = []
+    if args.out:
+        try:
+            sinks.append(FileSink(args.out))
+        except ValueError as e:
+            parser.error(str(e))
+    if args.tcp:
+        sinks.append(TcpSink(args.tcp))
+    if args.stdout:
+        sinks.append(StdoutSink())
+    if not sinks:
+        parser.error("choose at least one of --out, --tcp or --stdout")
+
+    try:
+        if args.source == "synth":
+            run_synth(args, sinks)
+        else:
+            run_replay(args, sinks)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for sink in sinks:
+            sink.close()
+
+
+if __name__ == "__main__":
+    main()